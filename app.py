@@ -1,9 +1,14 @@
 import streamlit as st
-import pdfplumber
-import json
-import base64
+import orjson
+import hashlib
+import pickle
 import requests
-import re
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from rrb_parser import parse_rrb_pdf
 
 # --- 1. ACCESS SECRETS ---
 try:
@@ -15,105 +20,165 @@ except Exception:
     st.error("Secrets not configured! Add GITHUB_TOKEN, REPO_OWNER, and REPO_NAME to Streamlit Secrets.")
     st.stop()
 
-# --- 2. THE ULTIMATE RRB PARSER (Fixes Empty Q.5 & Missing Q.32) ---
-def parse_rrb_pdf(uploaded_file):
-    all_questions = []
-    with pdfplumber.open(uploaded_file) as pdf:
-        full_text = ""
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                # Remove ads/noise that split questions
-                text = re.sub(r'Adda247|Adda 247|Google Play|INDIAN R|LWAY|AILWAY|Test Prime|Source', '', text)
-                full_text += text + "\n"
-
-    # Strategy: Find char positions of every Q.1 through Q.100
-    indices = []
-    for i in range(1, 101):
-        # Match Q.i followed by a space, newline, or digit/letter
-        pattern = re.compile(rf'Q\.{i}(?=\s|\n|[A-Z0-9])')
-        match = pattern.search(full_text)
-        if match:
-            indices.append((i, match.start(), match.end()))
-
-    for i in range(len(indices)):
-        q_num, start_pos, content_start = indices[i]
-        # Block ends at the start of the next question
-        end_pos = indices[i+1][1] if i+1 < len(indices) else len(full_text)
-        
-        # We capture the line containing "Q.x" but extract only the text after the marker
-        block = full_text[content_start:end_pos]
-        lines = [line.strip() for line in block.split('\n') if line.strip()]
-        
-        question_parts = []
-        options = []
-        answer = ""
-
-        # Option pattern: ignores leading symbols (X/✔)
-        opt_pattern = re.compile(r'.*?([1-4])\.\s*(.*)')
-
-        for line in lines:
-            opt_match = opt_pattern.match(line)
-            if opt_match and len(options) < 4:
-                opt_text = opt_match.group(2).strip()
-                options.append(opt_text)
-                if '✔' in line or 'Ans' in line:
-                    answer = opt_text
-            elif len(options) < 4:
-                # Still building the question text
-                if "Ans" not in line:
-                    question_parts.append(line)
-
-        # Ensure question text is not lost even if it was on the same line as Q.x
-        q_text = " ".join(question_parts).strip()
-        
-        while len(options) < 4:
-            options.append("Option not detected")
+# --- 2. BULK PARSING (the parser itself lives in rrb_parser.py) ---
+def parse_many(blobs):
+    # Processes sidestep the GIL; hosts that can't start worker processes parse in-line
+    # (not on threads: PyMuPDF doesn't support multithreaded use)
+    # The parser is imported from rrb_parser, not defined in this script: Streamlit swaps
+    # __main__ on every rerun, so a function pickled by its __main__ name can go stale mid-map
+    try:
+        # One worker per PDF at most; each worker is a fork of the whole server process
+        with ProcessPoolExecutor(max_workers=min(len(blobs), os.cpu_count() or 1)) as ex:
+            return list(ex.map(parse_rrb_pdf, blobs))
+    except (OSError, NotImplementedError, BrokenProcessPool, pickle.PicklingError):
+        return [parse_rrb_pdf(b) for b in blobs]
 
-        all_questions.append({
-            "id": q_num,
-            "question": q_text,
-            "options": options,
-            "answer": answer if answer else options[0]
-        })
+@st.cache_data(show_spinner=False)
+def parse_cached(pdf_bytes):
+    # Keyed on the PDF bytes, so reruns and repeat uploads skip the parse (parse_rrb_pdf stays importable for workers)
+    return parse_rrb_pdf(pdf_bytes)
 
-    return all_questions
+@st.cache_data(show_spinner=False)
+def parse_many_cached(blobs):
+    # Keyed on the tuple of PDF bytes, so a retried Push All of the same uploads skips the pool entirely
+    return parse_many(list(blobs))
 
 # --- 3. GITHUB API HELPERS ---
-def get_headers():
-    return {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json"}
+@st.cache_resource
+def get_session():
+    # One keep-alive session survives Streamlit reruns, so TLS handshakes are paid once
+    session = requests.Session()
+    session.headers.update({"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3+json"})
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=3, backoff_factor=0.3))
+    session.mount("https://", adapter)
+    return session
+
+SESSION = get_session()
+
+@st.cache_resource
+def get_etag_cache():
+    # (url, accept) -> last 200 response, shared across reruns and sessions
+    return {}
+
+ETAG_CACHE = get_etag_cache()
 
+def _gh_get(url, accept=None):
+    # Conditional GET: a 304 carries no body and doesn't count against the rate limit
+    key = (url, accept)
+    cached = ETAG_CACHE.get(key)
+    headers = {"Accept": accept} if accept else {}
+    if cached is not None:
+        headers["If-None-Match"] = cached.headers["ETag"]
+    res = SESSION.get(url, headers=headers)
+    if res.status_code == 304:
+        return cached
+    if res.status_code == 200 and "ETag" in res.headers:
+        ETAG_CACHE[key] = res
+    else:
+        ETAG_CACHE.pop(key, None)
+    return res
+
+QUIZZES_QUERY = """
+query($owner: String!, $name: String!, $expr: String!) {
+  repository(owner: $owner, name: $name) {
+    object(expression: $expr) {
+      ... on Tree { entries { name oid object { ... on Blob { text isTruncated } } } }
+    }
+  }
+}
+"""
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_quizzes():
+    # One GraphQL round trip returns the listing plus every quiz body, so switching papers is instant
+    variables = {"owner": REPO_OWNER, "name": REPO_NAME, "expr": f"{BRANCH}:quizzes"}
+    res = SESSION.post("https://api.github.com/graphql", json={"query": QUIZZES_QUERY, "variables": variables})
+    # Failures raise instead of returning {}, so st.cache_data doesn't memoise an empty listing for a minute
+    res.raise_for_status()
+    body = res.json()
+    if body.get('errors'):
+        raise RuntimeError("; ".join(e.get('message', '') for e in body['errors']))
+    tree = body['data']['repository']['object']
+    if not tree:
+        # The branch has no quizzes/ folder yet
+        return {}
+    return {e['name']: e for e in tree['entries'] if e['name'].endswith('.json')}
+
+@st.cache_data(ttl=60, show_spinner=False)
 def fetch_files():
-    url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/quizzes"
-    res = requests.get(url, headers=get_headers())
-    if res.status_code == 200:
-        return [f['name'] for f in res.json() if f['name'].endswith('.json')]
-    return []
+    # Cached on its own so a rerun copies just this small {name: oid} map, not every quiz body
+    return {name: e['oid'] for name, e in fetch_quizzes().items()}
 
-def push_to_git(filename, content):
-    url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/quizzes/{filename}"
-    res = requests.get(url, headers=get_headers())
-    sha = res.json().get('sha') if res.status_code == 200 else None
-    payload = {"message": f"Sync {filename}", "content": base64.b64encode(content.encode()).decode(), "branch": BRANCH}
-    if sha: payload["sha"] = sha
-    return requests.put(url, headers=get_headers(), json=payload)
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_quiz(filename):
+    try:
+        blob = fetch_quizzes().get(filename, {}).get('object') or {}
+    except (requests.RequestException, RuntimeError):
+        # The listing can outlive a failed refresh; the contents API below still serves the paper
+        blob = {}
+    if blob.get('text') is not None and not blob.get('isTruncated'):
+        return orjson.loads(blob['text'])
+    # Large blobs come back truncated from GraphQL; fetch those raw (no JSON envelope, no base64)
+    url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/quizzes/{filename}?ref={BRANCH}"
+    res = _gh_get(url, accept="application/vnd.github.v3.raw")
+    return orjson.loads(res.content)
+
+def git_blob_sha(content):
+    # The id git (and the listing's oid) gives a file with exactly these bytes
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
 
-def delete_from_git(filename):
+def push_all_to_git(files, message):
+    # files: {filename: content bytes, or None to delete}; lands as one commit on BRANCH via the Git Data API
+    api = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/git"
+    res = SESSION.get(f"{api}/ref/heads/{BRANCH}")
+    if res.status_code != 200:
+        return res
+    head_sha = res.json()['object']['sha']
+    res = SESSION.get(f"{api}/commits/{head_sha}")
+    if res.status_code != 200:
+        return res
+    base_tree = res.json()['tree']['sha']
+
+    # Inline contents let GitHub create the blobs, so the whole batch is one tree POST
+    tree = []
+    for filename, content in files.items():
+        entry = {"path": f"quizzes/{filename}", "mode": "100644", "type": "blob"}
+        if content is None:
+            entry["sha"] = None
+        else:
+            entry["content"] = content.decode('utf-8')
+        tree.append(entry)
+    # The tree carries every file's contents, so serialize it once with orjson instead of requests' json.dumps
+    body = orjson.dumps({"base_tree": base_tree, "tree": tree})
+    res = SESSION.post(f"{api}/trees", data=body, headers={"Content-Type": "application/json"})
+    if res.status_code != 201:
+        return res
+    payload = {"message": message, "tree": res.json()['sha'], "parents": [head_sha]}
+    res = SESSION.post(f"{api}/commits", json=payload)
+    if res.status_code != 201:
+        return res
+    return SESSION.patch(f"{api}/refs/heads/{BRANCH}", json={"sha": res.json()['sha']})
+
+def delete_from_git(filename, shas):
+    # shas is the BRANCH listing from fetch_files(), so no extra GET is needed for the blob sha
     url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/quizzes/{filename}"
-    res = requests.get(url, headers=get_headers())
-    if res.status_code == 200:
-        sha = res.json().get('sha')
-        payload = {"message": f"Delete {filename}", "sha": sha, "branch": BRANCH}
-        return requests.delete(url, headers=get_headers(), json=payload)
-    return res
+    payload = {"message": f"Delete {filename}", "sha": shas[filename], "branch": BRANCH}
+    return SESSION.delete(url, json=payload)
 
 # --- 4. STREAMLIT UI ---
+QUIZ_PAGE_SIZE = 10
+
 def main():
     st.set_page_config(page_title="RRB Exam Master", layout="wide")
     
     # Sidebar: Repository Management
     st.sidebar.title("📊 Repository Status")
-    quiz_files = fetch_files()
+    try:
+        quiz_shas = fetch_files()
+    except (requests.RequestException, RuntimeError) as e:
+        st.sidebar.error(f"Couldn't load papers from Git: {e}")
+        quiz_shas = {}
+    quiz_files = list(quiz_shas)
     st.sidebar.write(f"Papers in Git: **{len(quiz_files)}**")
     
     if quiz_files:
@@ -121,12 +186,21 @@ def main():
         st.sidebar.subheader("Management")
         f_del = st.sidebar.selectbox("Select Paper", quiz_files)
         if st.sidebar.button("🗑️ Delete Selected"):
-            if delete_from_git(f_del).status_code == 200:
+            if delete_from_git(f_del, quiz_shas).status_code == 200:
                 st.sidebar.success("Deleted!")
+                fetch_quizzes.clear()
+                fetch_files.clear()
                 st.rerun()
         if st.sidebar.button("🔥 WIPE ALL"):
-            for f in quiz_files: delete_from_git(f)
-            st.rerun()
+            # Every deletion lands in one commit instead of one DELETE round trip per paper
+            res = push_all_to_git({f: None for f in quiz_files}, f"Delete {len(quiz_files)} paper(s)")
+            if res.status_code == 200:
+                fetch_quizzes.clear()
+                fetch_files.clear()
+                fetch_quiz.clear()
+                st.rerun()
+            else:
+                st.sidebar.error(f"Wipe failed: {res.status_code} {res.text}")
 
     tab1, tab2 = st.tabs(["📤 Upload & Detect", "✍️ Practice Mode"])
 
@@ -136,7 +210,7 @@ def main():
         files = st.file_uploader("Upload RRB PDFs", type="pdf", accept_multiple_files=True)
         
         if files:
-            data = parse_rrb_pdf(files[0])
+            data = parse_cached(files[0].getvalue())
             count = len(data)
             st.subheader(f"Analysis for: {files[0].name}")
             
@@ -144,31 +218,72 @@ def main():
             c1.metric("Questions Found", f"{count}/100")
             
             if count < 100:
-                missing = [i for i in range(1, 101) if i not in [q['id'] for q in data]]
+                found_ids = {q['id'] for q in data}
+                missing = [i for i in range(1, 101) if i not in found_ids]
                 c2.error(f"Missing IDs: {missing}")
             else:
                 c2.success("Perfect capture! All 100 questions found.")
 
             if st.button("🚀 Push All to GitHub"):
-                for f in files:
-                    qs = parse_rrb_pdf(f)
-                    fname = f.name.replace(" ", "_").replace(".pdf", ".json")
-                    push_to_git(fname, json.dumps({"questions": qs}, indent=4))
-                st.success("Successfully synced all papers!")
-                st.rerun()
+                with st.spinner(f"Syncing {len(files)} paper(s)..."):
+                    # The first file was parsed for the analysis above; the rest are parsed together across processes
+                    parsed = [data]
+                    if len(files) > 1:
+                        parsed += parse_many_cached(tuple(f.getvalue() for f in files[1:]))
+                    jobs = {f.name.replace(" ", "_").replace(".pdf", ".json"): orjson.dumps({"questions": qs})
+                            for f, qs in zip(files, parsed)}
+                    # Papers whose JSON is byte-identical to what's in Git are left out of the commit
+                    jobs = {name: body for name, body in jobs.items() if quiz_shas.get(name) != git_blob_sha(body)}
+                    res = push_all_to_git(jobs, f"Sync {len(jobs)} paper(s)") if jobs else None
+                if res is None:
+                    st.info("All papers are already synced.")
+                elif res.status_code == 200:
+                    st.success("Successfully synced all papers!")
+                    fetch_quizzes.clear()
+                    fetch_files.clear()
+                    fetch_quiz.clear()
+                    st.rerun()
+                else:
+                    st.error(f"Sync failed: {res.status_code} {res.text}")
 
     # TAB 2: QUIZ
     with tab2:
         if quiz_files:
             selected = st.selectbox("Select a Practice Paper", quiz_files)
-            url = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/quizzes/{selected}"
-            res = requests.get(url, headers=get_headers())
-            content = json.loads(base64.b64decode(res.json()['content']).decode())
+            content = fetch_quiz(selected)
+            qs = content["questions"]
+            # Answers survive between submits and page switches, keyed on (paper, question id)
+            answers = st.session_state.setdefault("answers", {})
+            
+            # Only render one page of questions per rerun; the current page is remembered per paper
+            n_pages = max(1, (len(qs) + QUIZ_PAGE_SIZE - 1) // QUIZ_PAGE_SIZE)
+            page_key = f"page_{selected}"
+            page = min(st.session_state.get(page_key, 1), n_pages)
+            page_qs = qs[(page - 1) * QUIZ_PAGE_SIZE : page * QUIZ_PAGE_SIZE]
             
-            for q in content["questions"]:
-                st.write(f"**Q{q['id']}:** {q['question']}")
-                st.radio("Options:", q['options'], key=f"{selected}_{q['id']}", index=None)
-                st.divider()
+            # A form batches radio changes into one rerun; Prev/Next submit it too, so no page's choices are lost
+            with st.form(f"quiz_{selected}_{page}"):
+                for q in page_qs:
+                    st.write(f"**Q{q['id']}:** {q['question']}")
+                    prev = answers.get((selected, q['id']))
+                    idx = q['options'].index(prev) if prev in q['options'] else None
+                    st.radio("Options:", q['options'], key=f"{selected}_{q['id']}", index=idx)
+                    st.divider()
+                c_prev, c_submit, c_next = st.columns(3)
+                go_prev = c_prev.form_submit_button("⬅️ Prev", disabled=page == 1)
+                submitted = c_submit.form_submit_button("Submit")
+                go_next = c_next.form_submit_button("Next ➡️", disabled=page == n_pages)
+            st.caption(f"Page {page}/{n_pages}")
+            
+            if go_prev or go_next or submitted:
+                for q in page_qs:
+                    answers[(selected, q['id'])] = st.session_state[f"{selected}_{q['id']}"]
+            if go_prev or go_next:
+                st.session_state[page_key] = page - 1 if go_prev else page + 1
+                st.rerun()
+            if submitted:
+                score = sum(answers.get((selected, q['id'])) == q['answer'] for q in qs)
+                st.success(f"Score: {score}/{len(qs)}")
         else:
             st.info("No quizzes found. Upload PDFs in Tab 1.")
 
@@ -0,0 +1,178 @@
+import io
+import re
+try:
+    import re2  # google-re2: linear-time DFA matching, same API as re
+except ImportError:
+    re2 = re
+from bisect import bisect_right
+from itertools import accumulate
+from operator import itemgetter
+
+# Compiled once at import instead of per question / per line
+# Q.<n> followed by a space, newline, or digit/letter
+Q_ANY = re.compile(r'Q\.(\d+)(?=\s|\n|[A-Z0-9])')
+# Option pattern: ignores leading symbols (X/✔)
+OPT_PATTERN = re2.compile(r'.*?([1-4])\.\s*(.*)')
+# Ads/noise that split questions, grouped by leading character
+NOISE_RE = re2.compile(r'A(?:dda ?247|ILWAY)|Google Play|INDIAN R|LWAY|Test Prime|Source')
+# Below this much text per page MuPDF likely missed the text layer (or the page is a scan)
+MIN_CHARS_PER_PAGE = 20
+_MISSING_OPT = "Option not detected"
+_DIGITS = frozenset('1234')
+_OPT_ICONS = 'X✔ \t'
+
+def _q100_tail(tail, seen, text):
+    # Text after the Q.100 marker, grown page by page; None until Q.1-Q.99 and then Q.100 show up.
+    # Markers follow Q_ANY's rules, so "Q.1 to Q.100." on an instructions page never starts the tail
+    if tail is not None:
+        return tail + '\n' + text
+    for match in Q_ANY.finditer(text):
+        q_num = int(match.group(1))
+        if q_num == 100 and len(seen) == 99:
+            return text[match.end():]
+        if 1 <= q_num < 100:
+            seen.add(q_num)
+    return None
+
+def _ends_paper(tail):
+    # All 4 of Q.100's options have been read (same slot rules as _parse_block):
+    # later pages only hold instructions/explanations
+    slots = set()
+    for line in tail.split('\n'):
+        opt = match_option(line)
+        if opt is not None:
+            slots.add(opt[0])
+            if len(slots) == 4:
+                return True
+    return False
+
+def extract_text(pdf_bytes):
+    # PDF libraries are imported on first use so Practice Mode never pays for them
+    import pymupdf
+    # Ads/noise are stripped page by page, so no second full-document copy is built
+    try:
+        # MuPDF's plain-text mode skips the layout analysis we never use
+        with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+            parts = []
+            tail, seen = None, set()
+            for page in doc:
+                parts.append(NOISE_RE.sub('', page.get_text("text")))
+                tail = _q100_tail(tail, seen, parts[-1])
+                if tail is not None and _ends_paper(tail):
+                    break
+        text = "\n".join(parts)
+        if len(text) >= MIN_CHARS_PER_PAGE * len(parts):
+            return text
+    except Exception:
+        pass
+    # Fall back to pdfplumber for files MuPDF can't read or returns suspiciously little text for
+    import pdfplumber
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        parts = []
+        tail, seen = None, set()
+        for page in pdf.pages:
+            # Image-only/cover pages have (almost) no chars; skip their text clustering entirely
+            text = None
+            if len(page.chars) >= MIN_CHARS_PER_PAGE:
+                text = page.extract_text(x_tolerance=3, y_tolerance=3, layout=False)
+            # Drop the page's cached chars/objects so peak memory stays at ~one page
+            page.close()
+            if text:
+                parts.append(NOISE_RE.sub('', text))
+                tail = _q100_tail(tail, seen, parts[-1])
+                if tail is not None and _ends_paper(tail):
+                    break
+        return "\n".join(parts)
+
+def match_option(line):
+    # Returns (slot 0-3, option text) or None
+    # Fast path for the usual "✔ 2. text" shape; OPT_PATTERN only runs on lines that could still match
+    head = line.lstrip(_OPT_ICONS)
+    if len(head) >= 2 and head[0] in _DIGITS and head[1] == '.':
+        return int(head[0]) - 1, head[2:].strip()
+    if '.' in line:
+        opt_match = OPT_PATTERN.match(line)
+        if opt_match:
+            return int(opt_match.group(1)) - 1, opt_match.group(2).strip()
+    return None
+
+def _parse_block(block_lines):
+    # One question block -> (question text, 4 options, answer)
+    lines = [line.strip() for line in block_lines if line.strip()]
+    
+    question_parts = []
+    # Options land in the slot of their printed number, so out-of-order or repeated numbers can't misalign
+    options = [None] * 4
+    filled = 0
+    answer = ""
+
+    for line in lines:
+        opt = match_option(line)
+        if opt is not None:
+            slot, opt_text = opt
+            if options[slot] is None:
+                options[slot] = opt_text
+                filled += 1
+                if '✔' in line or 'Ans' in line:
+                    answer = opt_text
+            # Answers are only marked on option lines, so nothing after the 4th one matters
+            if filled == 4:
+                break
+        elif "Ans" not in line:
+            # Still building the question text
+            question_parts.append(line)
+
+    # Ensure question text is not lost even if it was on the same line as Q.x
+    q_text = " ".join(question_parts).strip()
+    
+    if filled < 4:
+        options = [opt if opt is not None else _MISSING_OPT for opt in options]
+    return q_text, options, answer
+
+# --- THE ULTIMATE RRB PARSER (Fixes Empty Q.5 & Missing Q.32) ---
+def parse_rrb_pdf(pdf_bytes):
+    # Takes raw bytes (not an UploadedFile) so it can be shipped to worker processes
+    all_questions = []
+    full_text = extract_text(pdf_bytes)
+
+    # Strategy: One sweep over the text, keeping the first marker of each Q.1 through Q.100
+    indices = []
+    seen = set()
+    for match in Q_ANY.finditer(full_text):
+        q_num = int(match.group(1))
+        if 1 <= q_num <= 100 and q_num not in seen:
+            seen.add(q_num)
+            indices.append((q_num, match.start(), match.end()))
+            if len(indices) == 100:
+                break
+
+    # Split the document once; line_ends[k] is the offset just past line k's newline
+    doc_lines = full_text.split('\n')
+    line_ends = list(accumulate(len(line) + 1 for line in doc_lines))
+
+    for i in range(len(indices)):
+        q_num, start_pos, content_start = indices[i]
+        # Block ends at the start of the next question
+        end_pos = indices[i+1][1] if i+1 < len(indices) else len(full_text)
+        
+        # We capture the line containing "Q.x" but extract only the text after the marker
+        first = bisect_right(line_ends, content_start)
+        last = bisect_right(line_ends, end_pos)
+        if first == last:
+            block_lines = [full_text[content_start:end_pos]]
+        else:
+            block_lines = [full_text[content_start:line_ends[first]]]
+            block_lines += doc_lines[first+1:last]
+            block_lines.append(full_text[line_ends[last-1]:end_pos])
+        q_text, options, answer = _parse_block(block_lines)
+
+        all_questions.append({
+            "id": q_num,
+            "question": q_text,
+            "options": options,
+            "answer": answer if answer else options[0]
+        })
+
+    # Blocks are carved in text order; keep the paper in question-number order
+    all_questions.sort(key=itemgetter('id'))
+    return all_questions